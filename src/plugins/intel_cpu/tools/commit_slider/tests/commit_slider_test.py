@@ -2,6 +2,8 @@
 # SPDX-License-Identifier: Apache-2.0
 
 import sys
+import os
+import tempfile
 from unittest import TestCase
 from tests import skip_commit_slider_devtest
 
@@ -9,6 +11,7 @@ sys.path.append('./')
 from test_util import getExpectedCommit,\
     getBordersByTestData, getActualCommit
 from utils.break_validator import validateBMOutput, BmValidationError
+from utils.helpers import getBlobDiff, getCashedPath, iterOutputBlocks
 from test_data import FirstBadVersionData, FirstValidVersionData,\
     BmStableData, BmValidatorSteppedBreakData, BmValidatorSteppedBreakData2,\
     BenchmarkAppDataUnstable, BenchmarkAppDataStable, BenchmarkAppNoDegradationData,\
@@ -132,3 +135,53 @@ class CommitSliderTest(TestCase):
             e.exception.errType,
             BmValidationError.BmValErrType.LOW_LOCAL_GAP
         )
+
+    def testBlobDiffIgnoresNan(self):
+        with tempfile.TemporaryDirectory() as tmpDir:
+            leftFile = os.path.join(tmpDir, "left.ieb")
+            rightFile = os.path.join(tmpDir, "right.ieb")
+            with open(leftFile, "w") as file:
+                file.write("0x7ffd0000\nnan\ninf\n1.0\n5.0\n")
+            with open(rightFile, "w") as file:
+                file.write("0x7ffe0000\nnan\ninf\n1.5\n1.0\n")
+            self.assertEqual(getBlobDiff(leftFile, rightFile), 4.0)
+
+    def testCashedPathLookup(self):
+        cfg = {"cachedPathConfig": {"cashMap": {
+            "build_e29169d0": "/build_e29169d",
+            "ov_01234567890abcdef_rel": "/ov_middle",
+            "aaaaaaa_first": "/first",
+            "aaaaaaa_second": "/second",
+            "tag-v1.0": "/tag"
+        }}}
+        # hash after prefix
+        self.assertEqual(
+            getCashedPath("e29169d0ffff", cfg), (True, "/build_e29169d"))
+        # hash in the middle of key
+        self.assertEqual(
+            getCashedPath("890abcd", cfg), (True, "/ov_middle"))
+        # first matching key wins
+        self.assertEqual(
+            getCashedPath("aaaaaaa111", cfg), (True, "/first"))
+        # non-hex commit is looked up by scan
+        self.assertEqual(getCashedPath("tag-v1.0", cfg), (True, "/tag"))
+        self.assertEqual(getCashedPath("fffffff", cfg), (False, None))
+
+    def testOutputBlocks(self):
+        class ChunkStream:
+            # returns given chunks one by one, as pipe does
+            def __init__(self, chunks):
+                self.chunks = chunks
+
+            def read1(self, size):
+                return self.chunks.pop(0) if self.chunks else b""
+
+        # crlf, \r\n and multibyte char split between reads,
+        # trailing partial line at eof
+        stream = ChunkStream(
+            [b"a\r\nb\r", b"\nc \xc3", b"\xa9\nd\re", b"\r\ntail"]
+        )
+        blocks = list(iterOutputBlocks(stream))
+        self.assertEqual("".join(blocks), "a\nb\nc \u00e9\nd\ne\ntail")
+        self.assertEqual(blocks[-1], "tail")
+        self.assertTrue(all(block.endswith("\n") for block in blocks[:-1]))
@@ -39,6 +39,11 @@ class Mode(ABC):
     def isPerformanceBased(self):
         return False
 
+    def isOutputPrefetchable(self):
+        # override if app launches for different commits are independent:
+        # no shared output files, no own cache, no performance measuring
+        return False
+
     def createCash(self):
         # In common case we use json.
         # Create cash is overrided if we need special algo for caching.
@@ -147,6 +152,12 @@ class Mode(ABC):
                     "Error handling mode {} is not supported".format(errorHandlingMode)
                     )
 
+    def prefetchOutput(self, list, cfg):
+        # only traversal over all commits takes advantage of prefetching
+        if not self.isOutputPrefetchable() or self.traversal.isComparative():
+            return
+        util.prefetchCashedOutput(list, cfg)
+
     def postRun(self, list: list):
         util.returnToActualVersion(self.cfg)
         if "printCSV" in self.cfg\
@@ -193,6 +204,7 @@ class Mode(ABC):
             list = self.prepareRun(list, cfg)
             for i, item in enumerate(list):
                 list[i] = item.replace('"', "")
+            self.prefetchOutput(list, cfg)
             self.traversal.wrappedBypass(
                 list, list, cfg
             )
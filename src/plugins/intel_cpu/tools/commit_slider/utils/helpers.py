@@ -2,23 +2,38 @@
 # SPDX-License-Identifier: Apache-2.0
 
 import importlib
+import codecs
+import functools
+import io
 import shutil
+import shlex
 import os
 import sys
 import subprocess
 from enum import Enum
+from concurrent.futures import ThreadPoolExecutor
 import re
-import json
 import logging as log
 from argparse import ArgumentParser
+try:
+    # faster parsing of large configs, if available
+    from orjson import loads as jsonLoads
+except ImportError:
+    from json import loads as jsonLoads
+
+
+# length of short hash, returned by getMeaningfullCommitTail()
+SHORT_HASH_LEN = 7
+SHORT_HASH_RE = re.compile(r"[0-9a-fA-F]{7}")
+HEX_RUN_RE = re.compile(r"[0-9a-fA-F]{7,}")
 
 
 def getMeaningfullCommitTail(commit):
-    return commit[:7]
+    return commit[:SHORT_HASH_LEN]
 
-def excludeModelPath(cmdStr):
-    args = cmdStr.split()
-    return args[args.index("-m") + 1]
+def excludeModelPath(cmdArgs):
+    # args are the same tokens, that app is launched with
+    return cmdArgs[cmdArgs.index("-m") + 1]
 
 def getParams():
     parser = ArgumentParser()
@@ -51,54 +66,79 @@ def getParams():
     presetCfgPath = "utils/cfg.json"
     customCfgPath = ""
     customCfgPath = argHolder.configuration
-    presetCfgData = None
-    with open(presetCfgPath) as cfgFile:
-        presetCfgData = json.load(cfgFile)
-    cfgFile.close()
+    with open(presetCfgPath, "rb") as cfgFile:
+        presetCfgData = jsonLoads(cfgFile.read())
 
     if argHolder.utility != "no_utility":
+        # additional args are passed to utility as pairs
         it = iter(additionalArgs)
-        addDict = dict(zip(it, it))
-        mergedArgs = {**(args.__dict__), **addDict}
-        argHolder = DictHolder(mergedArgs)
+        argHolder.__dict__.update(zip(it, it))
         return argHolder, presetCfgData, presetCfgPath
 
-    customCfgData = None
-    with open(customCfgPath) as cfgFile:
-        customCfgData = json.load(cfgFile)
-    cfgFile.close()
+    with open(customCfgPath, "rb") as cfgFile:
+        customCfgData = jsonLoads(cfgFile.read())
     # customize cfg
-    for key in customCfgData:
-        newVal = customCfgData[key]
-        presetCfgData[key] = newVal
+    presetCfgData.update(customCfgData)
 
     presetCfgData = absolutizePaths(presetCfgData)
     return argHolder, presetCfgData, customCfgPath
 
 
+def iterBlobValues(fileName, bufSize=16384):
+    # stream file by fixed-size blocks, unparsable lines
+    # (e.g. first line with memory address) are yielded as None
+    with open(fileName, "rb") as file:
+        carry = b""
+        while True:
+            block = file.read(bufSize)
+            if not block:
+                break
+            lines = (carry + block).split(b"\n")
+            carry = lines.pop()
+            for line in lines:
+                try:
+                    yield float(line)
+                except ValueError:
+                    yield None
+        if carry:
+            try:
+                yield float(carry)
+            except ValueError:
+                yield None
+
+
 def getBlobDiff(file1, file2):
-    with open(file1) as file:
-        content = file.readlines()
-    with open(file2) as sampleFile:
-        sampleContent = sampleFile.readlines()
-    # ignore first line with memory address
-    i = -1
-    curMaxDiff = 0
-    for sampleLine in sampleContent:
-        i = i + 1
-        if i >= len(sampleContent):
-            break
-        line = content[i]
-        sampleVal = 0
-        val = 0
-        try:
-            sampleVal = float(sampleLine)
-            val = float(line)
-        except ValueError:
-            continue
-        if val != sampleVal:
-            curMaxDiff = max(curMaxDiff, abs(val - sampleVal))
-    return curMaxDiff
+    # files are read in lockstep, unparsable pairs are ignored,
+    # reduction starts from 0, so nan diffs are never picked up
+    return functools.reduce(
+        max,
+        (abs(val - sampleVal) for val, sampleVal in zip(
+            iterBlobValues(file1), iterBlobValues(file2))
+            if val is not None and sampleVal is not None),
+        0
+    )
+
+
+def splitCmd(cmd, cfg):
+    # commands may be set as list of args or as string,
+    # backslashes in windows paths are kept by non-posix split
+    if isinstance(cmd, list):
+        return cmd
+    try:
+        return shlex.split(cmd, posix=(cfg["os"] != "win"))
+    except ValueError as e:
+        raise CfgError(
+            "Command '{cmd}' is not correct: {e}".format(cmd=cmd, e=e)
+            ) from e
+
+
+def getCmdArgs(cmdName, cfg):
+    # args are tokenized once during absolutizing of cfg,
+    # fallback for cfg, modified after that
+    cmdArgs = cfg.setdefault("cmdArgs", {})
+    if cmdName not in cmdArgs:
+        cmdArgs[cmdName] = splitCmd(cfg[cmdName], cfg)
+    return cmdArgs[cmdName]
 
 
 def absolutizePaths(cfg):
@@ -107,65 +147,70 @@ def absolutizePaths(cfg):
         cfg["workPath"] = cfg["linWorkPath"]
         cfg["os"] = "linux"
     elif pl == "win32":
-        wp = cfg["winWorkPath"]
-        wp = "echo {path}".format(path=wp)
-        wp = subprocess.check_output(wp, shell=True)
-        wp = wp.decode()
-        wp = wp.rstrip()
-        cfg["workPath"] = wp
+        # expand %var% without echo in shell
+        cfg["workPath"] = os.path.expandvars(cfg["winWorkPath"])
         cfg["os"] = "win"
     else:
         raise CfgError(
             "No support for current OS: {pl}".format(pl=pl)
             )
+    cfg["cmdArgs"] = {}
+    for cmdName in ["appCmd", "returnCmd"]:
+        if cmdName in cfg:
+            cfg["cmdArgs"][cmdName] = splitCmd(cfg[cmdName], cfg)
     if cfg["dlbConfig"]["launchedAsJob"]:
         cfg["appPath"] = cfg["dlbConfig"]["appPath"]
+    # cwd is requested once for all paths
+    cwd = os.getcwd()
     pathToAbsolutize = ["gitPath", "buildPath", "appPath", "workPath"]
     for item in pathToAbsolutize:
         path = cfg[item]
-        path = os.path.abspath(path)
+        path = os.path.normpath(os.path.join(cwd, path))
         cfg[item] = path
     if "preprocess" in cfg["runConfig"] and "file" in cfg["runConfig"]["preprocess"]:
         prepFile = cfg["runConfig"]["preprocess"]["file"]
-        prepFile = os.path.abspath(prepFile)
+        prepFile = os.path.normpath(os.path.join(cwd, prepFile))
         cfg["runConfig"]["preprocess"]["file"] = prepFile
     if "envVars" in cfg:
-        updatedEnvVars = []
+        # format ov-path in envvars for e2e case,
+        # resolved vars are left as is
         for env in cfg["envVars"]:
-            envKey = env["name"]
-            envVal = env["val"]
-            # format ov-path in envvars for e2e case
-            if "{gitPath}" in envVal:
-                envVal = envVal.format(gitPath=cfg["gitPath"])
-                envVal = os.path.abspath(envVal)
-                updatedVar = {"name": envKey, "val": envVal}
-                updatedEnvVars.append(updatedVar)
-            else:
-                updatedEnvVars.append(env)
-        cfg["envVars"] = updatedEnvVars
+            if "{gitPath}" in env["val"]:
+                envVal = env["val"].format(gitPath=cfg["gitPath"])
+                env["val"] = os.path.normpath(os.path.join(cwd, envVal))
+    getResolvedEnv(cfg)
     return cfg
 
 
+def getResolvedEnv(cfg):
+    # envVars as name-value dict, built once and memoized in cfg
+    if "resolvedEnv" not in cfg:
+        cfg["resolvedEnv"] = {
+            env["name"]: env["val"] for env in cfg.get("envVars", [])
+        }
+    return cfg["resolvedEnv"]
+
+
 def checkArgAndGetCommits(commArg, cfgData):
     # WA because of python bug with
     # re.search("^[a-zA-Z0-9]+\.\.[a-zA-Z0-9]+$", commArg)
     if not len(commArg.split("..")) == 2:
         raise ValueError("{arg} is not correct commit set".format(arg=commArg))
     else:
-        getCommitSetCmd = 'git log {interval} --boundary --pretty="%h"'.format(
-            interval=commArg
-        )
-        proc = subprocess.Popen(
-            getCommitSetCmd.split(),
+        # quotes are kept in the format, so hashes are printed quoted,
+        # as with getCommitListCmd
+        getCommitSetCmd = [
+            "git", "log", commArg, "--boundary", '--pretty="%h"'
+        ]
+        out = subprocess.run(
+            getCommitSetCmd,
             cwd=cfgData["gitPath"],
             stdout=subprocess.PIPE,
             stderr=subprocess.STDOUT,
-        )
-        proc.wait()
-        out, err = proc.communicate()
-        out = out.decode("utf-8")
+            encoding="utf-8"
+        ).stdout
         outList = out.split()
-        if re.search(".*fatal.*", out):
+        if "fatal" in out:
             print(out)
             raise ValueError("{arg} commit set is invalid".format(arg=commArg))
         elif len(outList) == 0:
@@ -183,6 +228,9 @@ def runCommandList(commit, cfgData):
     gitPath = cfgData["gitPath"]
     buildPath = cfgData["buildPath"]
     defRepo = gitPath
+    makeCmd = cfgData["makeCmd"]
+    # cashed path doesn't depend on command, so is looked up once
+    pathExists, cashedPath = getCashedPath(commit, cfgData)
     for cmd in commandList:
         if "tag" in cmd:
             if cmd["tag"] == "preprocess":
@@ -192,15 +240,12 @@ def runCommandList(commit, cfgData):
                 ):
                     raise CfgError("No preprocess provided")
                 prePrName = cfgData["runConfig"]["preprocess"]["name"]
-                mod = importlib.import_module(
-                    "utils.preprocess.{pp}".format(pp=prePrName)
+                preProcess = resolveAttr(
+                    "utils.preprocess.{pp}".format(pp=prePrName), prePrName
                 )
-                preProcess = getattr(mod, prePrName)
                 preProcess(cfgData, commit)
                 continue
-        makeCmd = cfgData["makeCmd"]
         # {commit}, {makeCmd}, {cashedPath} placeholders
-        pathExists, cashedPath = getCashedPath(commit, cfgData)
         if pathExists:
             # todo - and {} in cmd
             strCommand = cmd["cmd"].format(
@@ -222,17 +267,20 @@ def runCommandList(commit, cfgData):
         commitLogger.info("Run command: {command}".format(
             command=formattedCmd)
         )
+        catchRe = re.compile(cmd["catchMsg"]) if "catchMsg" in cmd else None
         proc = subprocess.Popen(
             formattedCmd, cwd=cwd, stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            encoding="utf-8", errors="replace"
+            stderr=subprocess.STDOUT, bufsize=1 << 20
         )
-        for line in proc.stdout:
+        for block in iterOutputBlocks(proc.stdout):
             if cfgData["verboseOutput"]:
-                sys.stdout.write(line)
-            commitLogger.info(line)
-            if "catchMsg" in cmd:
-                isErrFound = re.search(cmd["catchMsg"], line)
+                sys.stdout.write(block)
+            commitLogger.info(block, extra={"rawOutput": True})
+            if catchRe is not None:
+                # catchMsg is searched line by line, as before
+                isErrFound = any(
+                    catchRe.search(line) for line in block.split("\n")
+                    )
                 if isErrFound:
                     raise BuildError(
                         errType=BuildError.BuildErrType.UNDEFINED,
@@ -243,6 +291,28 @@ def runCommandList(commit, cfgData):
         checkOut, err = proc.communicate()
 
 
+def iterOutputBlocks(stream, blockSize=65536):
+    # yield process output as blocks of complete lines,
+    # read1() returns available data without waiting for full block,
+    # \r\n and \r are translated to \n as in text-mode pipe
+    decoder = io.IncrementalNewlineDecoder(
+        codecs.getincrementaldecoder("utf-8")(errors="replace"),
+        translate=True
+    )
+    carry = ""
+    while True:
+        chunk = stream.read1(blockSize)
+        text = carry + decoder.decode(chunk, final=not chunk)
+        if not chunk:
+            if text:
+                yield text
+            return
+        lastNewLine = text.rfind("\n") + 1
+        carry = text[lastNewLine:]
+        if lastNewLine:
+            yield text[:lastNewLine]
+
+
 def fetchAppOutput(cfg, commit):
     commitLogger = getCommitLogger(cfg, commit)
     appPath = cfg["appPath"]
@@ -254,32 +324,51 @@ def fetchAppOutput(cfg, commit):
                 "App path, corresponding commit {c} is cashed, "
                 "value:{p}".format(c=commit, p=suggestedAppPath))
             appPath = suggestedAppPath
-    newEnv = os.environ.copy()
-    if "envVars" in cfg:
-        for env in cfg["envVars"]:
-            envKey = env["name"]
-            envVal = env["val"]
-            newEnv[envKey] = envVal
-    appCmd = cfg["appCmd"]
+    prefetchedOutput = cfg.get("serviceConfig", {}).get("prefetchedOutput", {})
+    if commit in prefetchedOutput:
+        # app for cashed commit was already launched concurrently
+        return prefetchedOutput.pop(commit)
+    newEnv = {**os.environ, **getResolvedEnv(cfg)}
+    appCmd = getCmdArgs("appCmd", cfg)
     commitLogger.info("Run command: {command}".format(
         command=appCmd)
     )
     shellFlag = True
     if cfg["os"] == "linux":
         shellFlag = False
-    p = subprocess.Popen(
-        appCmd.split(),
+    output = subprocess.run(
+        appCmd,
         cwd=appPath,
         stdout=subprocess.PIPE,
         stderr=subprocess.STDOUT,
         env=newEnv,
-        shell=shellFlag
-    )
-    output, err = p.communicate()
-    output = output.decode("utf-8")
+        shell=shellFlag,
+        encoding="utf-8"
+    ).stdout
     return output
 
 
+def prefetchCashedOutput(commitList, cfg):
+    # launch app for all commits concurrently, if every commit
+    # is cashed and no build is necessary, app is run in
+    # subprocess, so threads are enough to use all cores
+    cashCfg = cfg["cachedPathConfig"]
+    workerNum = cashCfg.get("parallelCachedWorkers", 0)
+    if not (workerNum and cashCfg["enabled"] and cashCfg["passCmdList"]):
+        return
+    if not all(getCashedPath(commit, cfg)[0] for commit in commitList):
+        return
+    workerNum = min(workerNum, os.cpu_count() or 1, len(commitList))
+    with ThreadPoolExecutor(max_workers=workerNum) as executor:
+        outputList = executor.map(
+            lambda commit: fetchAppOutput(cfg, commit),
+            commitList
+        )
+        cfg["serviceConfig"]["prefetchedOutput"] = dict(
+            zip(commitList, outputList)
+        )
+
+
 def handleCommit(commit, cfgData):
     commitLogger = getCommitLogger(cfgData, commit)
     cashedPath = None
@@ -343,12 +432,34 @@ def handleCommit(commit, cfgData):
                         )
 
 
+def getCashMapIndex(cfgData):
+    # cashMap indexed by every short-hash-sized window of hex runs in
+    # keys, so that lookup is equal to 'shortHash in key' for any key
+    # like 'build_<hash>', first matching key wins as in plain scan,
+    # index is runtime data, so it's kept in serviceConfig
+    serviceCfg = cfgData.setdefault("serviceConfig", {})
+    if "shortHashIndex" not in serviceCfg:
+        index = {}
+        for k, v in cfgData["cachedPathConfig"]["cashMap"].items():
+            for hexRun in HEX_RUN_RE.findall(k):
+                for i in range(len(hexRun) - SHORT_HASH_LEN + 1):
+                    index.setdefault(hexRun[i:i + SHORT_HASH_LEN], v)
+        serviceCfg["shortHashIndex"] = index
+    return serviceCfg["shortHashIndex"]
+
+
 def getCashedPath(commit, cfgData):
     shortHash = getMeaningfullCommitTail(commit)
+    if SHORT_HASH_RE.fullmatch(shortHash):
+        cashIndex = getCashMapIndex(cfgData)
+        if shortHash in cashIndex:
+            return True, cashIndex[shortHash]
+        return False, None
+    # commit is not hash-like, fallback to scan
     cashMap = cfgData["cachedPathConfig"]["cashMap"]
     for k in cashMap:
         if shortHash in k:
-            return True, cfgData["cachedPathConfig"]["cashMap"][k]
+            return True, cashMap[k]
     return False, None
 
 
@@ -359,45 +470,28 @@ def getReducedInterval(list, cfg):
     # and (False, None) otherwise
     if not cfg["cachedPathConfig"]["enabled"]:
         return False, None
-    cashMap = cfg["cachedPathConfig"]["cashMap"]
     for i, commitHash in enumerate(list):
         list[i] = commitHash.replace('"', "")
     i1 = None
     i2 = None
-    for commitHash in list:
-        shortHash = getMeaningfullCommitTail(commitHash)
-        for cashedCommit in cashMap:
-            if shortHash in cashedCommit:
-                i2 = commitHash
-                break
-    for commitHash in reversed(list):
-        shortHash = getMeaningfullCommitTail(commitHash)
-        for cashedCommit in cashMap:
-            if shortHash in cashedCommit:
-                i1 = commitHash
-                break
+    for i, commitHash in enumerate(list):
+        if getCashedPath(commitHash, cfg)[0]:
+            if i1 is None:
+                i1 = i
+            i2 = i
     if i1 == i2:
         return False, None
     else:
-        reducedList = []
-        for i in list:
-            if not reducedList:
-                if i == i1:
-                    reducedList.append(i)
-            else:
-                reducedList.append(i)
-                if i == i2:
-                    break
+        reducedList = list[i1:i2 + 1]
         return True, reducedList
 
 
 def returnToActualVersion(cfg):
-    cmd = cfg["returnCmd"]
+    cmd = getCmdArgs("returnCmd", cfg)
     cwd = cfg["gitPath"]
-    proc = subprocess.Popen(
-        cmd.split(), cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT
+    subprocess.run(
+        cmd, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT
     )
-    proc.wait()
     return
 
 
@@ -405,10 +499,9 @@ def setupLogger(name, logPath, logFileName, level=log.INFO):
     if not os.path.exists(logPath):
         os.makedirs(logPath)
     logFileName = logPath + logFileName
-    with open(logFileName, "w"):  # clear old log
-        pass
-    handler = log.FileHandler(logFileName)
-    formatter = log.Formatter("%(asctime)s %(levelname)s %(message)s")
+    # old log is cleared on first emit
+    handler = log.FileHandler(logFileName, mode="w", delay=True)
+    formatter = RawOutputFormatter("%(asctime)s %(levelname)s %(message)s")
     handler.setFormatter(formatter)
     logger = log.getLogger(name)
     logger.setLevel(level)
@@ -416,6 +509,15 @@ def setupLogger(name, logPath, logFileName, level=log.INFO):
     return logger
 
 
+class RawOutputFormatter(log.Formatter):
+    # subprocess output is written as is, without timestamp
+    # and level, to avoid formatting it line by line
+    def format(self, record):
+        if getattr(record, "rawOutput", False):
+            return record.getMessage().rstrip("\n")
+        return super().format(record)
+
+
 def getCommitLogger(cfg, commit):
     logName = "commitLogger_{c}".format(c=commit)
     if log.getLogger(logName).hasHandlers():
@@ -435,26 +537,26 @@ def getActualPath(pathName, cfg):
 def safeClearDir(path, cfg):
     if not os.path.exists(path):
         os.makedirs(path)
-    if cfg["os"] == "win":
-        shutil.rmtree(path)
-    else:
-        # WA, because of unstability of rmtree()
-        # in linux environment
-        p = subprocess.Popen(
-            "rm -rf *", cwd=path,
-            stdout=subprocess.PIPE, shell=True
-        )
-        p.wait()
+    # directory itself is kept, only its content is removed
+    with os.scandir(path) as it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                shutil.rmtree(entry.path)
+            else:
+                os.unlink(entry.path)
     return
 
 
+@functools.lru_cache(maxsize=None)
+def resolveAttr(modPath, attrName):
+    return getattr(importlib.import_module(modPath), attrName)
+
+
 def runUtility(cfg, args):
     modName = args.utility
     try:
-        mod = importlib.import_module(
-            "utils.{un}".format(un=modName))
         utilName = checkAndGetUtilityByName(cfg, modName)
-        utility = getattr(mod, utilName)
+        utility = resolveAttr("utils.{un}".format(un=modName), utilName)
         utility(args)
     except ModuleNotFoundError as e:
         raise CfgError("No utility {} found".format(modName))
@@ -530,16 +632,31 @@ def checkAndGetUtilityByName(cfg, utilName):
         return cfg["utilMap"][utilName]
 
 
+def getSubclassRegistry(parentClass, rebuild=False):
+    # name-to-class map of direct subclasses, cached on parent class,
+    # ambiguous names are mapped to None
+    registry = parentClass.__dict__.get("subclassRegistry")
+    if registry is None or rebuild:
+        registry = {}
+        for cl in parentClass.__subclasses__():
+            registry[cl.__name__] = None if cl.__name__ in registry else cl
+        parentClass.subclassRegistry = registry
+    return registry
+
+
 def checkAndGetSubclass(clName, parentClass):
-    cl = [cl for cl in parentClass.__subclasses__() if cl.__name__ == clName]
-    if not (cl.__len__() == 1):
+    registry = getSubclassRegistry(parentClass)
+    if clName not in registry:
+        # subclass could be defined after registry was built
+        registry = getSubclassRegistry(parentClass, rebuild=True)
+    cl = registry.get(clName)
+    if cl is None:
         raise CfgError("Class {clName} doesn't exist".format(clName=clName))
     else:
-        return cl[0]
+        return cl
 
 
 class DictHolder:
     def __init__(self, dict: dict = None):
         if dict is not None:
-            for k, v in dict.items():
-                setattr(self, k, v)
+            self.__dict__.update(dict)
@@ -4,6 +4,7 @@
 import os
 from utils.helpers import fetchAppOutput, getActualPath
 from utils.helpers import getMeaningfullCommitTail, excludeModelPath
+from utils.helpers import getCmdArgs
 from utils.helpers import handleCommit, getBlobDiff
 from utils.helpers import getCommitLogger, CashError, CfgError,\
 CmdError, PreliminaryAnalysisError
@@ -21,6 +22,9 @@ class NopMode(Mode):
     def checkCfg(self, cfg):
         super().checkCfg(cfg)
 
+    def isOutputPrefetchable(self):
+        return True
+
     def getPseudoMetric(self, commit, cfg):
         commit = commit.replace('"', "")
         commitLogger = getCommitLogger(cfg, commit)
@@ -132,7 +136,9 @@ class BenchmarkAppPerformanceMode(Mode):
     def preliminaryCheck(self, list, cfg):
         # model path checking
         if cfg["preliminaryCheckCfg"]["checkBenchmarkModelPath"]:
-            cmdStr = cfg["appCmd"]
+            appCmd = cfg["appCmd"]
+            # joined list is used only to detect benchmark_app
+            cmdStr = " ".join(appCmd) if isinstance(appCmd, list) else appCmd
             matcher = re.search(
                 "benchmark.*-m[\s*]([^\S]*)",
                 cmdStr,
@@ -141,7 +147,7 @@ class BenchmarkAppPerformanceMode(Mode):
             if matcher is not None:
                 # pass if app is not openvino benchmark_app
                 try:
-                    modelPath = excludeModelPath(cmdStr)
+                    modelPath = excludeModelPath(getCmdArgs("appCmd", cfg))
                     if not os.path.isfile(modelPath):
                         raise PreliminaryAnalysisError(
                             "path {modelPath} does not exist, check config".format(